@@ -7,14 +7,74 @@ from document text content.
 
 import logging
 import json
+import hashlib
+import threading
+from functools import lru_cache
+import httpx
 import openai
+import orjson
 from openai import OpenAI
-import time
-import random
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+import semantic_cache
+import summary_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Model used for summarization
+MODEL = "gpt-4o"
+
+# Bump whenever the prompt changes so cached summaries are invalidated
+PROMPT_VERSION = "v2"
+
+SYSTEM_PROMPT = """
+        You are an expert summarizer and knowledge extractor. Your task is to:
+        1. Create a concise summary (3-5 sentences) of the key points in the document
+        2. Extract 3-7 key concepts/ideas from the document
+        3. Format your response in JSON with two fields: 'summary' and 'key_concepts' (an array)
+
+        Focus on the most important and unique ideas in the text. Ignore routine or boilerplate content.
+        """
+
+# Documents with fewer words and characters than these are used as their
+# own summary. The character bound catches text with few spaces, such as
+# CJK prose or CSV exports, that is long despite its low word count.
+MIN_SUMMARY_WORDS = 30
+MIN_SUMMARY_CHARS = 500
+
+# Summaries produced during this run, keyed like the summary cache
+_run_summaries = {}
+
+# Retries for rate limits, timeouts and 5xx errors are left to the SDK,
+# which backs off with jitter and honors the server's Retry-After header
+MAX_RETRIES = 6
+REQUEST_TIMEOUT = 60.0
+
+# Clients are shared so their connection pools are reused across calls
+_client_cache = {}
+_client_lock = threading.Lock()
+
+BATCH_SYSTEM_PROMPT = """
+        You are an expert summarizer and knowledge extractor. You will receive several documents,
+        each enclosed between the lines '<<<MTEXTS DOCUMENT n>>>' and '<<<END MTEXTS DOCUMENT n>>>',
+        where n is the document number. For every document:
+        1. Create a concise summary (3-5 sentences) of the key points in the document
+        2. Extract 3-7 key concepts/ideas from the document
+
+        Format your response in JSON with a single field 'results': an array containing one object
+        per document, each with three fields: 'doc' (the document number), 'summary' and
+        'key_concepts' (an array)
+
+        Focus on the most important and unique ideas in the text. Ignore routine or boilerplate content.
+        """
+
+
 def generate_content_summary(content, api_key, max_tokens=8000):
     """
     Generate a summary and extract key concepts from document content using OpenAI.
@@ -33,54 +93,41 @@ def generate_content_summary(content, api_key, max_tokens=8000):
             'key_concepts': []
         }
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    client = _get_client(api_key)
     
-    # Truncate content if too long (rough approximation of tokens)
-    # About 4 chars per token for English text
-    char_limit = max_tokens * 4  
-    truncated_content = content[:char_limit] if len(content) > char_limit else content
+    truncated_content = truncate_content(content, max_tokens)
     
-    if len(content) > char_limit:
-        logger.warning(f"Content truncated from {len(content)} to {char_limit} characters")
-        truncated_content += "\n\n[Content truncated due to length]"
+    # Trivially short documents are their own summary
+    short_summary = _short_content_summary(truncated_content)
+    if short_summary is not None:
+        return short_summary
+    
+    # Reuse a previous summary of identical content if one is cached
+    cache_key = summary_cache_key(truncated_content)
+    cached = _get_cached_summary(cache_key)
+    if cached is not None:
+        logger.info("Using cached summary")
+        return cached
+    
+    # Fall back to the summary of a near-duplicate document, if enabled
+    embedding, similar = _find_similar_summary(client, truncated_content)
+    if similar is not None:
+        _store_summary(cache_key, similar)
+        return similar
     
     try:
-        # Create the prompt for summarization
-        system_prompt = """
-        You are an expert summarizer and knowledge extractor. Your task is to:
-        1. Create a concise summary (3-5 sentences) of the key points in the document
-        2. Extract 3-7 key concepts/ideas from the document
-        3. Format your response in JSON with two fields: 'summary' and 'key_concepts' (an array)
-
-        Focus on the most important and unique ideas in the text. Ignore routine or boilerplate content.
-        """
-        
         user_prompt = f"Please summarize this document and extract its key concepts:\n\n{truncated_content}"
         
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        # Parse the response
-        result = json.loads(response.choices[0].message.content)
-        
-        # Ensure the response has the expected format
-        if 'summary' not in result or 'key_concepts' not in result:
-            logger.warning("API response missing expected fields")
-            result = {
-                'summary': result.get('summary', "Summary generation failed."),
-                'key_concepts': result.get('key_concepts', [])
-            }
+        # Call OpenAI API and parse the response
+        result, complete = normalize_summary(
+            _complete_json(client, SYSTEM_PROMPT, user_prompt, 1000))
         
+        # Incomplete responses are not cached so later runs retry them
+        if complete:
+            _store_summary(cache_key, result)
+            if embedding is not None:
+                semantic_cache.add(cache_key, embedding, result, MODEL,
+                                   PROMPT_VERSION)
         return result
         
     except Exception as e:
@@ -91,33 +138,370 @@ def generate_content_summary(content, api_key, max_tokens=8000):
         }
 
 
-def retry_with_exponential_backoff(func, max_retries=5, initial_delay=1):
+def generate_content_summaries_batch(contents, api_key, batch_size=5,
+                                     max_tokens=8000):
+    """
+    Generate summaries for several documents using as few API calls as possible.
+    
+    Documents found in neither the summary cache nor the semantic cache
+    are sent to OpenAI in groups of batch_size, each group in a single
+    request. A group whose response cannot be matched
+    back to its documents is summarized one document at a time instead.
+    
+    Args:
+        contents: List of document text contents to summarize
+        api_key: OpenAI API key
+        batch_size: Maximum number of documents per API call
+        max_tokens: Maximum tokens to process per document
+    
+    Returns:
+        List of summary dictionaries, in the same order as contents
+    """
+    if len(contents) == 1 or batch_size <= 1:
+        return [generate_content_summary(content, api_key, max_tokens)
+                for content in contents]
+    
+    results = [None] * len(contents)
+    pending = []
+    for i, content in enumerate(contents):
+        if not content or not content.strip():
+            results[i] = generate_content_summary(content, api_key, max_tokens)
+            continue
+        
+        truncated_content = truncate_content(content, max_tokens)
+        short_summary = _short_content_summary(truncated_content)
+        if short_summary is not None:
+            results[i] = short_summary
+            continue
+        
+        cache_key = summary_cache_key(truncated_content)
+        cached = _get_cached_summary(cache_key)
+        if cached is not None:
+            logger.info("Using cached summary")
+            results[i] = cached
+            continue
+        
+        embedding, similar = _find_similar_summary(
+            _get_client(api_key), truncated_content)
+        if similar is not None:
+            _store_summary(cache_key, similar)
+            results[i] = similar
+        else:
+            pending.append((i, truncated_content, cache_key, embedding))
+    
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        summaries = None
+        if len(batch) > 1:
+            summaries = _summarize_batch(
+                api_key, [truncated for _, truncated, _, _ in batch])
+        
+        if summaries is None:
+            for i, _, _, _ in batch:
+                results[i] = generate_content_summary(
+                    contents[i], api_key, max_tokens)
+            continue
+        
+        for (i, _, cache_key, embedding), (summary, complete) in zip(
+                batch, summaries):
+            if complete:
+                _store_summary(cache_key, summary)
+                if embedding is not None:
+                    semantic_cache.add(cache_key, embedding, summary, MODEL,
+                                       PROMPT_VERSION)
+            results[i] = summary
+    
+    return results
+
+
+def _summarize_batch(api_key, truncated_contents):
+    """
+    Summarize several documents in a single API call.
+    
+    Args:
+        api_key: OpenAI API key
+        truncated_contents: List of already truncated document contents
+    
+    Returns:
+        List of (summary, complete) pairs as returned by normalize_summary,
+        in the order of truncated_contents, or None if the call failed or
+        the response does not contain exactly one result per document
+    """
+    client = _get_client(api_key)
+    
+    # Delimiters that are unlikely to appear in the documents themselves
+    documents = "\n\n".join(
+        f"<<<MTEXTS DOCUMENT {i}>>>\n{truncated}\n"
+        f"<<<END MTEXTS DOCUMENT {i}>>>"
+        for i, truncated in enumerate(truncated_contents, 1)
+    )
+    user_prompt = f"Please summarize each of these documents and extract their key concepts:\n\n{documents}"
+    
+    try:
+        results = _complete_json(
+            client, BATCH_SYSTEM_PROMPT, user_prompt,
+            1000 * len(truncated_contents)
+        ).get('results')
+    except Exception as e:
+        logger.error(f"Error generating batch summary: {str(e)}")
+        return None
+    
+    if (not isinstance(results, list)
+            or not all(isinstance(result, dict) for result in results)):
+        logger.warning("Batch API response does not match the documents sent")
+        return None
+    
+    # Match results to documents by the number the model echoed back,
+    # never by position; any missing or repeated number rejects the batch
+    by_doc = {}
+    for result in results:
+        doc = result.pop('doc', None)
+        if type(doc) is not int or doc in by_doc:
+            by_doc = None
+            break
+        by_doc[doc] = result
+    expected = range(1, len(truncated_contents) + 1)
+    if by_doc is None or sorted(by_doc) != list(expected):
+        logger.warning("Batch API response does not match the documents sent")
+        return None
+    
+    return [normalize_summary(by_doc[doc]) for doc in expected]
+
+
+def _find_similar_summary(client, truncated_content):
+    """
+    Look up the summary of a near-duplicate document in the semantic cache.
+    
+    Args:
+        client: OpenAI client
+        truncated_content: The content as it will be sent to the model
+    
+    Returns:
+        Tuple of the content's embedding and the similar document's
+        summary; either is None if the semantic cache is disabled, the
+        embedding failed or no stored document is similar enough
+    """
+    if not semantic_cache.is_enabled():
+        return None, None
+    
+    try:
+        embedding = embed_content(client, truncated_content)
+    except openai.OpenAIError as e:
+        logger.warning(f"Error embedding content: {str(e)}")
+        return None, None
+    
+    similar = semantic_cache.lookup(embedding, MODEL, PROMPT_VERSION)
+    if similar is not None:
+        logger.info("Using summary of a similar document")
+    return embedding, similar
+
+
+def _complete_json(client, system_prompt, user_prompt, max_tokens):
+    """
+    Run a JSON-mode chat completion and parse the result.
+    
+    The response is streamed so tokens are consumed as they are
+    generated rather than in one block after the model finishes.
+    
+    Args:
+        client: OpenAI client
+        system_prompt: System message for the model
+        user_prompt: User message for the model
+        max_tokens: Maximum number of tokens to generate
+    
+    Returns:
+        Dictionary parsed from the model's JSON response
+    """
+    stream = client.chat.completions.create(
+        model=MODEL,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.3,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    
+    parts = []
+    for chunk in stream:
+        if chunk.choices:
+            parts.append(chunk.choices[0].delta.content or "")
+    return orjson.loads("".join(parts))
+
+
+def _get_client(api_key):
+    """
+    Return the shared OpenAI client for an API key.
+    
+    Args:
+        api_key: OpenAI API key
+    
+    Returns:
+        OpenAI client whose connection pool is kept alive between calls
+    """
+    with _client_lock:
+        client = _client_cache.get(api_key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                max_retries=MAX_RETRIES,
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=32,
+                        max_keepalive_connections=32
+                    )
+                )
+            )
+            _client_cache[api_key] = client
+        return client
+
+
+def truncate_content(content, max_tokens):
     """
-    Retry a function with exponential backoff to handle rate limits.
+    Truncate content to fit the token budget of a single document.
     
     Args:
-        func: Function to retry
-        max_retries: Maximum number of retry attempts
-        initial_delay: Initial delay in seconds
+        content: The document text content
+        max_tokens: Maximum tokens to keep
     
     Returns:
-        Result of the function call
-    """
-    retries = 0
-    delay = initial_delay
-    
-    while retries < max_retries:
-        try:
-            return func()
-        except openai.RateLimitError:
-            retries += 1
-            if retries >= max_retries:
-                raise
-            
-            # Exponential backoff with jitter
-            sleep_time = delay * (2 ** retries) + (random.uniform(0, 1))
-            logger.warning(f"Rate limited. Retrying in {sleep_time:.2f} seconds...")
-            time.sleep(sleep_time)
-        except Exception:
-            # Don't retry other exceptions
-            raise
\ No newline at end of file
+        The content, truncated with a marker if it was too long
+    """
+    # Every token covers at least one UTF-8 byte and a character takes at
+    # most four bytes, so this bound holds without encoding the content
+    if len(content) * 4 <= max_tokens:
+        return content
+    
+    encoding = _get_encoding()
+    if encoding is None:
+        # Rough approximation of tokens: about 4 chars per token for English
+        char_limit = max_tokens * 4
+        if len(content) <= char_limit:
+            return content
+        
+        logger.warning(f"Content truncated from {len(content)} to {char_limit} characters")
+        return content[:char_limit] + "\n\n[Content truncated due to length]"
+    
+    # Only encode a generous prefix of very long documents; fall back to
+    # the full text if the prefix turns out to fit the budget.
+    prefix = content[:max_tokens * 16]
+    tokens = encoding.encode(prefix, disallowed_special=())
+    if len(tokens) <= max_tokens and len(prefix) < len(content):
+        tokens = encoding.encode(content, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return content
+    
+    logger.warning(f"Content truncated to {max_tokens} tokens")
+    return encoding.decode(tokens[:max_tokens]) + "\n\n[Content truncated due to length]"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    """Return the tokenizer for MODEL, or None if it is unavailable."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.encoding_for_model(MODEL)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer, estimating tokens from length: {e}")
+        return None
+
+
+def normalize_summary(result):
+    """
+    Ensure a summary returned by the API has the expected fields.
+    
+    Args:
+        result: Dictionary parsed from the API response
+    
+    Returns:
+        Tuple of a dictionary with 'summary' and 'key_concepts' fields and
+        a flag that is False if missing fields had to be filled in
+    """
+    if 'summary' not in result or 'key_concepts' not in result:
+        logger.warning("API response missing expected fields")
+        return {
+            'summary': result.get('summary', "Summary generation failed."),
+            'key_concepts': result.get('key_concepts', [])
+        }, False
+    return result, True
+
+
+def _short_content_summary(truncated_content):
+    """
+    Summarize a trivially short document without calling the API.
+    
+    Args:
+        truncated_content: The content as it would be sent to the model
+    
+    Returns:
+        Summary dictionary, or None if the content is long enough to
+        need a real summary
+    """
+    if len(truncated_content) >= MIN_SUMMARY_CHARS:
+        return None
+    
+    # Splitting stops after MIN_SUMMARY_WORDS words, so long documents
+    # are not split in full.
+    words = truncated_content.split(maxsplit=MIN_SUMMARY_WORDS)
+    if len(words) >= MIN_SUMMARY_WORDS:
+        return None
+    
+    return {
+        'summary': truncated_content.strip(),
+        'key_concepts': []
+    }
+
+
+def _get_cached_summary(cache_key):
+    """Look up a summary from this run, then from the on-disk cache."""
+    summary = _run_summaries.get(cache_key)
+    if summary is None:
+        summary = summary_cache.get(cache_key)
+        if summary is not None:
+            _run_summaries[cache_key] = summary
+    return summary
+
+
+def _store_summary(cache_key, summary):
+    """Remember a summary for this run and store it in the on-disk cache."""
+    _run_summaries[cache_key] = summary
+    summary_cache.put(cache_key, summary, MODEL, PROMPT_VERSION)
+
+
+def summary_cache_key(truncated_content):
+    """
+    Compute the cache key for a summary request.
+    
+    Args:
+        truncated_content: The content as it will be sent to the model
+    
+    Returns:
+        Hex SHA-256 digest identifying the request
+    """
+    payload = json.dumps(
+        {"model": MODEL, "pv": PROMPT_VERSION, "content": truncated_content},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def embed_content(client, truncated_content):
+    """
+    Embed document content for the semantic cache.
+    
+    Args:
+        client: OpenAI client
+        truncated_content: The content as it will be sent to the model
+    
+    Returns:
+        List of floats with the content embedding
+    """
+    response = client.embeddings.create(
+        model=semantic_cache.EMBEDDING_MODEL,
+        input=truncated_content[:8000]
+    )
+    return response.data[0].embedding
@@ -6,13 +6,29 @@ including PDFs, Google Docs, PowerPoint files, etc.
 """
 
 import io
+import hashlib
 import logging
+import multiprocessing
 import tempfile
+import threading
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 # Third-party imports for handling different file types
-import PyPDF2
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
 try:
     import docx
     DOCX_AVAILABLE = True
@@ -21,10 +37,17 @@ except ImportError:
 
 try:
     import pptx
+    from pptx.shapes.group import GroupShape
     PPTX_AVAILABLE = True
 except ImportError:
     PPTX_AVAILABLE = False
 
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
 try:
     from bs4 import BeautifulSoup
     BS4_AVAILABLE = True
@@ -32,23 +55,85 @@ except ImportError:
     BS4_AVAILABLE = False
 
 # Import the Google Drive functions
-from google_drive import export_google_doc
+from google_drive import (
+    download_file,
+    download_file_to_path,
+    export_google_doc,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Bump whenever extraction output changes so cached extractions are
+# invalidated
+EXTRACTOR_VERSION = "v1"
+
+# PDFs with fewer pages are extracted serially to skip process pool overhead
+PARALLEL_PDF_MIN_PAGES = 8
 
-def extract_file_content(drive_client, file_info):
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# PDFium is not thread-safe, even across documents, and extractors run in
+# worker threads, so all in-process pdfium calls are serialized.
+_pdfium_lock = threading.Lock()
+
+
+def extract_file_content(drive_client, file_info, cache_dir=None):
     """
     Extract content from a file based on its MIME type.
     
     Args:
         drive_client: Google Drive API service object
         file_info: File metadata dictionary
+        cache_dir: Optional directory for cached extractions; files whose
+            modifiedTime is unchanged are read from it instead of Drive
     
     Returns:
         String containing the extracted text content
     """
+    cache_path = _extraction_cache_path(file_info, cache_dir)
+    if cache_path is not None and cache_path.exists():
+        try:
+            logger.info(f"Using cached content for: {file_info.get('name', 'Unknown file')}")
+            return cache_path.read_text(encoding='utf-8')
+        except OSError as e:
+            logger.warning(f"Error reading extraction cache: {e}")
+    
+    text = _extract_by_mime_type(drive_client, file_info)
+    
+    # Placeholders for errors and unsupported files are not cached, so
+    # they are retried on the next run
+    if cache_path is not None and text and not _is_placeholder(text):
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = cache_path.with_suffix('.tmp')
+            temp_path.write_text(text, encoding='utf-8')
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Error writing extraction cache: {e}")
+    
+    return text
+
+
+def _extraction_cache_path(file_info, cache_dir):
+    """Return the cache file for a file version, or None if not cacheable."""
+    modified_time = file_info.get('modifiedTime')
+    if not cache_dir or not modified_time:
+        return None
+    
+    cache_key = f"{EXTRACTOR_VERSION}:{file_info.get('id')}:{modified_time}"
+    digest = hashlib.sha1(cache_key.encode('utf-8')).hexdigest()
+    return Path(cache_dir) / 'extracted' / f"{digest}.txt"
+
+
+def _is_placeholder(text):
+    """Check whether text is a bracketed error or status message."""
+    return text.startswith('[') and text.endswith(']') and '\n' not in text
+
+
+def _extract_by_mime_type(drive_client, file_info):
+    """Dispatch to the extractor for the file's MIME type."""
     mime_type = file_info.get('mimeType', '')
     file_id = file_info.get('id')
     file_name = file_info.get('name', 'Unknown file')
@@ -87,12 +172,26 @@ def extract_file_content(drive_client, file_info):
         return f"[Content extraction not supported for file type: {mime_type}]"
 
 
+def decode_text(content):
+    """
+    Decode downloaded UTF-8 content to a string.
+    
+    Args:
+        content: BytesIO object with the downloaded bytes
+    
+    Returns:
+        Decoded text, with undecodable bytes replaced
+    """
+    # Decode straight from the buffer; getvalue() would copy it first
+    return str(content.getbuffer(), encoding='utf-8', errors='replace')
+
+
 def extract_google_doc(drive_client, file_id):
     """Extract text from a Google Doc."""
     try:
         content = export_google_doc(drive_client, file_id, mime_type='text/plain')
         if content:
-            return content.getvalue().decode('utf-8')
+            return decode_text(content)
         return ""
     except Exception as e:
         logger.error(f"Error extracting Google Doc: {e}")
@@ -104,7 +203,7 @@ def extract_google_sheet(drive_client, file_id):
     try:
         content = export_google_doc(drive_client, file_id, mime_type='text/csv')
         if content:
-            return content.getvalue().decode('utf-8')
+            return decode_text(content)
         return ""
     except Exception as e:
         logger.error(f"Error extracting Google Sheet: {e}")
@@ -117,7 +216,7 @@ def extract_google_slides(drive_client, file_id):
         # Export as plain text first
         content = export_google_doc(drive_client, file_id, mime_type='text/plain')
         if content:
-            return content.getvalue().decode('utf-8')
+            return decode_text(content)
             
         # Fallback: try to export as PDF and extract text
         pdf_content = export_google_doc(drive_client, file_id, mime_type='application/pdf')
@@ -133,7 +232,6 @@ def extract_google_slides(drive_client, file_id):
 def extract_pdf(drive_client, file_id):
     """Extract text from a PDF file."""
     try:
-        from google_drive import download_file
         content = download_file(drive_client, file_id)
         if content:
             return extract_text_from_pdf_bytes(content)
@@ -145,45 +243,130 @@ def extract_pdf(drive_client, file_id):
 
 def extract_text_from_pdf_bytes(pdf_bytes):
     """Extract text from PDF file bytes."""
-    text = ""
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_bytes)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
-        return text
+        # Prefer PDFium, which is much faster than PyPDF2's pure-Python parser
+        if PDFIUM_AVAILABLE:
+            return _extract_pdf_text_pdfium(pdf_bytes.getvalue())
+        if PYPDF2_AVAILABLE:
+            return _extract_pdf_text_pypdf2(pdf_bytes)
+        return "[pypdfium2 library not installed. Cannot extract PDF content.]"
     except Exception as e:
         logger.error(f"Error extracting text from PDF bytes: {e}")
         return f"[Error extracting PDF content: {str(e)}]"
 
 
+def _extract_pdf_text_pdfium(data):
+    """Extract text from PDF bytes using pypdfium2."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            page_count = len(pdf)
+            if page_count < PARALLEL_PDF_MIN_PAGES:
+                return "\n\n".join(
+                    _extract_pdfium_pages(pdf, range(page_count)))
+        finally:
+            pdf.close()
+    
+    # Pages are independent, so split them into one contiguous range per
+    # core; each worker reopens the document once for its range.
+    workers = os.cpu_count() or 1
+    step = -(-page_count // workers)
+    pool = _get_pdf_pool()
+    try:
+        futures = [
+            pool.submit(_extract_pdf_page_range, data, start,
+                        min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        return "\n\n".join(
+            part for future in futures for part in future.result())
+    except BrokenProcessPool:
+        # A worker died, e.g. on a malformed PDF. Replace the pool for
+        # later documents and retry this one in-process.
+        logger.warning("PDF worker process died, extracting serially")
+        _discard_pdf_pool(pool)
+        with _pdfium_lock:
+            return "\n\n".join(_extract_pdf_page_range(data, 0, page_count))
+
+
+def _extract_pdf_page_range(data, start, stop):
+    """Extract the text of pages start..stop-1 from PDF bytes."""
+    pdf = pdfium.PdfDocument(data)
+    try:
+        return _extract_pdfium_pages(pdf, range(start, stop))
+    finally:
+        pdf.close()
+
+
+def _extract_pdfium_pages(pdf, page_indices):
+    """Extract the text of the given pages from an open PDF document."""
+    parts = []
+    for index in page_indices:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        # PDFium marks line breaks with \r\n; keep plain \n like PyPDF2
+        text = textpage.get_text_range()
+        parts.append(text.replace('\r\n', '\n').replace('\r', '\n'))
+        textpage.close()
+        page.close()
+    return parts
+
+
+def _discard_pdf_pool(pool):
+    """Drop a broken process pool so the next PDF starts a new one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+def _get_pdf_pool():
+    """Return the process pool shared by all PDF extractions."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Extractors run in worker threads, where forking is unsafe,
+            # so start the pool processes with spawn.
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pdf_pool
+
+
+def _extract_pdf_text_pypdf2(pdf_bytes):
+    """Extract text from a PDF file object using PyPDF2."""
+    pdf_reader = PyPDF2.PdfReader(pdf_bytes)
+    parts = [page.extract_text() for page in pdf_reader.pages]
+    return "\n\n".join(part for part in parts if part)
+
+
 def extract_docx(drive_client, file_id):
     """Extract text from a DOCX file."""
     if not DOCX_AVAILABLE:
         return "[python-docx library not installed. Cannot extract DOCX content.]"
         
     try:
-        from google_drive import download_file
-        content = download_file(drive_client, file_id)
-        if not content:
-            return ""
-            
-        # Create a temporary file to load the docx
+        # Download straight into a temporary file to load the docx
         with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-            temp_file.write(content.getvalue())
             temp_path = temp_file.name
-            
-        # Extract text from the docx
-        doc = docx.Document(temp_path)
-        full_text = []
-        for para in doc.paragraphs:
-            full_text.append(para.text)
-            
-        # Clean up temporary file
+        
         try:
-            os.unlink(temp_path)
-        except:
-            pass
+            if not download_file_to_path(drive_client, file_id, temp_path):
+                return ""
+            
+            # Extract text from the docx
+            doc = docx.Document(temp_path)
+            full_text = []
+            for para in doc.paragraphs:
+                full_text.append(para.text)
+        finally:
+            # Clean up temporary file
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
             
         return '\n'.join(full_text)
     except Exception as e:
@@ -197,35 +380,31 @@ def extract_pptx(drive_client, file_id):
         return "[python-pptx library not installed. Cannot extract PPTX content.]"
         
     try:
-        from google_drive import download_file
-        content = download_file(drive_client, file_id)
-        if not content:
-            return ""
-            
-        # Create a temporary file to load the pptx
+        # Download straight into a temporary file to load the pptx
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as temp_file:
-            temp_file.write(content.getvalue())
             temp_path = temp_file.name
-            
-        # Extract text from the pptx
-        presentation = pptx.Presentation(temp_path)
-        full_text = []
         
-        # Extract text from slides
-        for slide in presentation.slides:
-            slide_text = []
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    slide_text.append(shape.text)
+        try:
+            if not download_file_to_path(drive_client, file_id, temp_path):
+                return ""
+            
+            # Extract text from the pptx
+            presentation = pptx.Presentation(temp_path)
+            full_text = []
             
-            if slide_text:
-                full_text.append("\n".join(slide_text))
+            # Extract text from slides
+            for slide in presentation.slides:
+                slide_text = [text for shape in slide.shapes
+                              for text in _iter_shape_text(shape) if text]
                 
-        # Clean up temporary file
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
+                if slide_text:
+                    full_text.append("\n".join(slide_text))
+        finally:
+            # Clean up temporary file
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
             
         return '\n\n'.join(full_text)
     except Exception as e:
@@ -233,13 +412,25 @@ def extract_pptx(drive_client, file_id):
         return f"[Error extracting PPTX: {str(e)}]"
 
 
+def _iter_shape_text(shape):
+    """Yield the text of a slide shape, including grouped shapes and tables."""
+    if shape.has_text_frame:
+        yield shape.text_frame.text
+    elif shape.has_table:
+        for row in shape.table.rows:
+            for cell in row.cells:
+                yield cell.text_frame.text
+    elif isinstance(shape, GroupShape):
+        for child in shape.shapes:
+            yield from _iter_shape_text(child)
+
+
 def extract_text_file(drive_client, file_id):
     """Extract text from a plain text file."""
     try:
-        from google_drive import download_file
         content = download_file(drive_client, file_id)
         if content:
-            return content.getvalue().decode('utf-8', errors='replace')
+            return decode_text(content)
         return ""
     except Exception as e:
         logger.error(f"Error extracting text file: {e}")
@@ -248,24 +439,21 @@ def extract_text_file(drive_client, file_id):
 
 def extract_html(drive_client, file_id):
     """Extract text from an HTML file."""
-    if not BS4_AVAILABLE:
-        return "[BeautifulSoup4 library not installed. Cannot extract HTML content.]"
+    if not SELECTOLAX_AVAILABLE and not BS4_AVAILABLE:
+        return "[selectolax or BeautifulSoup4 library not installed. Cannot extract HTML content.]"
         
     try:
-        from google_drive import download_file
         content = download_file(drive_client, file_id)
         if not content:
             return ""
             
-        html_content = content.getvalue().decode('utf-8', errors='replace')
-        soup = BeautifulSoup(html_content, 'html.parser')
+        html_content = decode_text(content)
         
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-            
-        # Get text
-        text = soup.get_text()
+        # Prefer selectolax's C parser, which is much faster than html.parser
+        if SELECTOLAX_AVAILABLE:
+            text = _html_to_text_selectolax(html_content)
+        else:
+            text = _html_to_text_bs4(html_content)
         
         # Break into lines and remove leading and trailing space
         lines = (line.strip() for line in text.splitlines())
@@ -277,4 +465,27 @@ def extract_html(drive_client, file_id):
         return text
     except Exception as e:
         logger.error(f"Error extracting HTML: {e}")
-        return f"[Error extracting HTML: {str(e)}]"
\ No newline at end of file
+        return f"[Error extracting HTML: {str(e)}]"
+
+
+def _html_to_text_selectolax(html_content):
+    """Get the visible text of an HTML document using selectolax."""
+    tree = HTMLParser(html_content)
+    
+    # Remove script and style elements
+    for node in tree.css('script, style'):
+        node.decompose()
+    
+    root = tree.body if tree.body is not None else tree.root
+    return root.text(separator='') if root is not None else ""
+
+
+def _html_to_text_bs4(html_content):
+    """Get the visible text of an HTML document using BeautifulSoup."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.extract()
+    
+    return soup.get_text()
\ No newline at end of file
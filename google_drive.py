@@ -12,7 +12,8 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import HttpRequest, MediaIoBaseDownload, build_http
+import google_auth_httplib2
 import io
 
 # Configure logging
@@ -21,6 +22,44 @@ logger = logging.getLogger(__name__)
 # Define the scopes needed for Google Drive access
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# Bytes fetched per download request. Each chunk is a separate HTTPS
+# round trip, so large chunks matter on high-latency links; 8 MB stays
+# below the 10 MB per-chunk limit of get_media.
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_DOWNLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+
+_download_chunk_size = DEFAULT_DOWNLOAD_CHUNK_SIZE
+
+# MIME type Google Drive uses for folders
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Maximum number of folder lookups sent in one batch HTTP request
+FOLDER_BATCH_SIZE = 100
+
+# Name and parent ID of every folder seen during this run, by folder ID
+_folder_cache = {}
+
+
+def set_download_chunk_size(chunk_size):
+    """
+    Set the chunk size used for file downloads and exports.
+    
+    Sizes above the 10 MB per-chunk limit are clamped to it; sizes
+    below one byte raise ValueError.
+    
+    Args:
+        chunk_size: Number of bytes fetched per request
+    """
+    global _download_chunk_size
+    if chunk_size < 1:
+        raise ValueError(f"Download chunk size must be positive: {chunk_size}")
+    if chunk_size > MAX_DOWNLOAD_CHUNK_SIZE:
+        logger.warning(
+            f"Download chunk size {chunk_size} exceeds the Drive limit, "
+            f"using {MAX_DOWNLOAD_CHUNK_SIZE}")
+        chunk_size = MAX_DOWNLOAD_CHUNK_SIZE
+    _download_chunk_size = chunk_size
+
 
 def create_drive_client(credentials_path, token_path):
     """
@@ -56,8 +95,17 @@ def create_drive_client(credentials_path, token_path):
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
     
+    # httplib2 is not thread-safe, so give every request its own
+    # transport; this lets the service be shared across worker threads.
+    # build_http applies the client library's default socket timeout.
+    def build_request(http, *args, **kwargs):
+        new_http = google_auth_httplib2.AuthorizedHttp(
+            creds, http=build_http())
+        return HttpRequest(new_http, *args, **kwargs)
+    
     # Build and return the Drive service
-    service = build('drive', 'v3', credentials=creds)
+    service = build('drive', 'v3', credentials=creds,
+                    requestBuilder=build_request)
     return service
 
 
@@ -72,17 +120,87 @@ def list_all_files(drive_service, folder_id=None):
     Returns:
         List of file metadata dictionaries
     """
-    all_files = []
-    page_token = None
+    all_files = list_content_files(drive_service, folder_id)
     
+    # Load the folder tree up front so paths resolve without per-file
+    # requests. A single folder has few ancestors, so only fetch those;
+    # for the whole Drive, list every folder in one paged query.
+    try:
+        if folder_id:
+            fetch_folders(drive_service, all_files)
+        else:
+            list_folders(drive_service)
+    except Exception as e:
+        logger.warning(f"Error fetching parent folders: {e}")
+    
+    # For each file, get its full path in Drive for better context
+    for file_info in all_files:
+        try:
+            file_info['path'] = get_file_path(drive_service, file_info)
+        except Exception as e:
+            logger.warning(f"Could not get path for file {file_info['name']}: {e}")
+            file_info['path'] = "Unknown path"
+    
+    return all_files
+
+
+def list_content_files(drive_service, folder_id=None):
+    """
+    List all non-folder files in Google Drive or in a specific folder.
+    
+    Args:
+        drive_service: Google Drive API service object
+        folder_id: Optional ID of folder to list files from
+    
+    Returns:
+        List of file metadata dictionaries
+    """
     # Build the query based on folder_id
-    query = "trashed = false"
+    query = f"mimeType != '{FOLDER_MIME_TYPE}' and trashed = false"
     if folder_id:
         query += f" and '{folder_id}' in parents"
     
     # Fields to retrieve for each file
     fields = "nextPageToken, files(id, name, mimeType, createdTime, modifiedTime, webViewLink, parents)"
     
+    return _list_paged(drive_service, query, fields)
+
+
+def list_folders(drive_service):
+    """
+    List all folders in Google Drive and add them to the folder cache.
+    
+    Args:
+        drive_service: Google Drive API service object
+    
+    Returns:
+        List of folder metadata dictionaries
+    """
+    query = f"mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+    fields = "nextPageToken, files(id, name, parents)"
+    
+    folders = _list_paged(drive_service, query, fields)
+    for folder in folders:
+        _folder_cache[folder['id']] = (
+            folder['name'], folder.get('parents', [None])[0])
+    return folders
+
+
+def _list_paged(drive_service, query, fields):
+    """
+    Collect every page of results for a files().list query.
+    
+    Args:
+        drive_service: Google Drive API service object
+        query: Drive search query
+        fields: Fields to retrieve, including nextPageToken
+    
+    Returns:
+        List of file metadata dictionaries
+    """
+    all_files = []
+    page_token = None
+    
     while True:
         try:
             # Get batch of files
@@ -107,17 +225,51 @@ def list_all_files(drive_service, folder_id=None):
             logger.error(f"Error listing files: {e}")
             break
     
-    # For each file, get its full path in Drive for better context
-    for file_info in all_files:
-        try:
-            file_info['path'] = get_file_path(drive_service, file_info)
-        except Exception as e:
-            logger.warning(f"Could not get path for file {file_info['name']}: {e}")
-            file_info['path'] = "Unknown path"
-    
     return all_files
 
 
+def fetch_folders(drive_service, files):
+    """
+    Fetch and cache the name and parent of every folder above the files.
+    
+    Folders are fetched one hierarchy level at a time, with up to
+    FOLDER_BATCH_SIZE lookups sent in a single batch HTTP request.
+    Folders already in the cache are not fetched again.
+    
+    Args:
+        drive_service: Google Drive API service object
+        files: List of file metadata dictionaries with 'parents' fields
+    """
+    requested = set()
+    
+    def store_folder(request_id, response, exception):
+        if exception is not None:
+            logger.warning(f"Error getting parent info: {exception}")
+            return
+        _folder_cache[request_id] = (
+            response['name'], response.get('parents', [None])[0])
+    
+    pending = {file_info['parents'][0] for file_info in files
+               if file_info.get('parents')}
+    while pending:
+        requested.update(pending)
+        missing = sorted(pending - _folder_cache.keys())
+        for start in range(0, len(missing), FOLDER_BATCH_SIZE):
+            batch = drive_service.new_batch_http_request()
+            for folder_id in missing[start:start + FOLDER_BATCH_SIZE]:
+                batch.add(
+                    drive_service.files().get(
+                        fileId=folder_id, fields='name,parents'),
+                    callback=store_folder,
+                    request_id=folder_id
+                )
+            batch.execute()
+        
+        # Move up one level in folder hierarchy
+        pending = {_folder_cache[folder_id][1] for folder_id in pending
+                   if folder_id in _folder_cache} - requested - {None}
+
+
 def get_file_path(drive_service, file_info):
     """
     Get the full path of a file in Google Drive.
@@ -129,38 +281,54 @@ def get_file_path(drive_service, file_info):
     Returns:
         String representing the full path of the file
     """
-    path_parts = [file_info['name']]
-    
     # Handle case where file has no parents
     if 'parents' not in file_info or not file_info['parents']:
         return f"/{file_info['name']}"
     
-    # Recursively get parent folders
+    # Collect folder names from the file upwards, then reverse them
+    path_parts = [file_info['name']]
+    seen = set()
     current_parent = file_info['parents'][0]
     while current_parent:
+        # Guard against folder hierarchies that loop back on themselves
+        if current_parent in seen:
+            path_parts.append("...")
+            break
+        seen.add(current_parent)
+        
         try:
-            parent_info = drive_service.files().get(
-                fileId=current_parent,
-                fields='name,parents'
-            ).execute()
-            
-            path_parts.insert(0, parent_info['name'])
-            
-            # Move up one level in folder hierarchy
-            current_parent = parent_info.get('parents', [None])[0]
-            
-            # Prevent infinite loops
-            if len(path_parts) > 100:
-                path_parts.insert(0, "...")
-                break
-                
+            name, current_parent = _get_parent(drive_service, current_parent)
         except Exception as e:
-            path_parts.insert(0, "...")
+            path_parts.append("...")
             logger.warning(f"Error getting parent info: {e}")
             break
+        
+        path_parts.append(name)
     
     # Construct path string
-    return "/" + "/".join(path_parts)
+    return "/" + "/".join(reversed(path_parts))
+
+
+def _get_parent(drive_service, folder_id):
+    """
+    Get the name and parent of a folder, fetching it at most once per run.
+    
+    Args:
+        drive_service: Google Drive API service object
+        folder_id: ID of the folder
+    
+    Returns:
+        Tuple of the folder name and its parent ID (None at the top)
+    """
+    folder = _folder_cache.get(folder_id)
+    if folder is None:
+        response = drive_service.files().get(
+            fileId=folder_id,
+            fields='name,parents'
+        ).execute()
+        folder = (response['name'], response.get('parents', [None])[0])
+        _folder_cache[folder_id] = folder
+    return folder
 
 
 def download_file(drive_service, file_id):
@@ -177,7 +345,8 @@ def download_file(drive_service, file_id):
     try:
         request = drive_service.files().get_media(fileId=file_id)
         file_content = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_content, request)
+        downloader = MediaIoBaseDownload(
+            file_content, request, chunksize=_download_chunk_size)
         
         done = False
         while not done:
@@ -191,6 +360,38 @@ def download_file(drive_service, file_id):
         return None
 
 
+def download_file_to_path(drive_service, file_id, path):
+    """
+    Download a file's content from Google Drive directly to disk.
+    
+    Chunks are written to the file as they arrive, so the content is
+    never held in memory as a whole.
+    
+    Args:
+        drive_service: Google Drive API service object
+        file_id: ID of the file to download
+        path: Local path to write the content to
+    
+    Returns:
+        True if the download succeeded, False otherwise
+    """
+    try:
+        request = drive_service.files().get_media(fileId=file_id)
+        with open(path, 'wb') as file_content:
+            downloader = MediaIoBaseDownload(
+                file_content, request, chunksize=_download_chunk_size)
+            
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error downloading file {file_id}: {e}")
+        return False
+
+
 def get_single_file(drive_service, file_id):
     """
     Get metadata for a single file by ID.
@@ -240,7 +441,8 @@ def export_google_doc(drive_service, file_id, mime_type='text/plain'):
     try:
         request = drive_service.files().export_media(fileId=file_id, mimeType=mime_type)
         file_content = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_content, request)
+        downloader = MediaIoBaseDownload(
+            file_content, request, chunksize=_download_chunk_size)
         
         done = False
         while not done:
@@ -7,12 +7,27 @@ generates summaries using OpenAI, and compiles everything into a structured Mark
 """
 
 import os
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import json
 from datetime import datetime
 import argparse
 
+import orjson
+
+import semantic_cache
+import summary_cache
+from ai_summary import generate_content_summaries_batch
+from extractors import extract_file_content
+from google_drive import (
+    create_drive_client,
+    get_single_file as get_drive_file,
+    list_all_files,
+    set_download_chunk_size,
+)
+from markdown_generator import create_knowledge_base
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +35,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Default number of files processed at the same time
+DEFAULT_CONCURRENCY = 8
+
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -60,22 +78,75 @@ def parse_arguments():
         default="config.json",
         help="Path to configuration file"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help=f"Maximum number of concurrent downloads and summaries "
+             f"(default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of documents summarized per OpenAI call"
+    )
+    parser.add_argument(
+        "--download-chunk-mb",
+        type=int,
+        default=8,
+        help="Size in MB of each Google Drive download request "
+             "(1-10, default: 8)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=summary_cache.DEFAULT_CACHE_DIR,
+        help="Directory for cached summaries and extracted content"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write any caches"
+    )
+    parser.add_argument(
+        "--semantic-cache",
+        action="store_true",
+        help="Reuse summaries of near-duplicate documents (costs one "
+             "embeddings call per uncached document)"
+    )
     return parser.parse_args()
 
 
 def main():
     """Main entry point for the script."""
+    asyncio.run(main_async())
+
+
+async def main_async():
+    """Asynchronous driver for the extraction pipeline."""
     args = parse_arguments()
     
     # Validate mutually exclusive arguments
     if args.file_id and args.folder_id:
         raise ValueError("--file-id and --folder-id are mutually exclusive. Use one or the other.")
+    if args.download_chunk_mb < 1:
+        raise ValueError("--download-chunk-mb must be at least 1.")
     
     # Load configuration
     config = load_config(args.config)
+    concurrency = args.concurrency
+    if concurrency is None:
+        concurrency = config.get('concurrency', DEFAULT_CONCURRENCY)
+    if concurrency < 1:
+        raise ValueError("--concurrency and the config 'concurrency' value must be at least 1.")
+    cache_dir = None if args.no_cache else args.cache_dir
+    summary_cache.configure(cache_dir)
+    if args.semantic_cache or config.get('semantic_cache'):
+        semantic_cache.configure(cache_dir)
     
     # Initialize Google Drive client
     drive_client = initialize_drive_client(args.credentials, args.token)
+    configure_downloads(args.download_chunk_mb)
     
     # Get list of files
     if args.file_id:
@@ -89,37 +160,127 @@ def main():
         files = list_files(drive_client, args.folder_id)
         logger.info(f"Found {len(files)} files to process")
     
-    # Process each file
-    results = []
-    for file_info in files:
-        try:
-            # Extract text based on file type
-            content = extract_content(drive_client, file_info)
-            
-            if content and content.strip():
-                # Generate summary with OpenAI
-                summary = generate_summary(content, config['openai_api_key'])
-                
-                # Prepare document entry
-                doc_entry = {
-                    'metadata': file_info,
-                    'summary': summary,
-                    'content': content
-                }
-                
-                results.append(doc_entry)
-                logger.info(f"Processed: {file_info['name']}")
-            else:
-                logger.warning(f"No content extracted from: {file_info['name']}")
-        
-        except Exception as e:
-            logger.error(f"Error processing {file_info['name']}: {str(e)}")
+    # Process files concurrently, bounded by the configured limit
+    results = await process_files(
+        drive_client, files, config['openai_api_key'], concurrency,
+        max(1, args.batch_size), cache_dir)
     
     # Generate final markdown
     generate_markdown(results, args.output)
     logger.info(f"Knowledge base created at: {args.output}")
 
 
+async def process_files(drive_client, files, api_key, concurrency,
+                        batch_size=1, cache_dir=None):
+    """
+    Extract and summarize all files concurrently.
+    
+    Files are grouped into batches of batch_size whose summaries are
+    requested in a single OpenAI call. Downloads and summaries are
+    bounded by separate semaphores, so the next files keep downloading
+    while earlier ones wait on OpenAI.
+    
+    Args:
+        drive_client: Google Drive API service object
+        files: List of file metadata dictionaries
+        api_key: OpenAI API key
+        concurrency: Maximum number of calls in flight per stage
+        batch_size: Number of documents summarized per OpenAI call
+        cache_dir: Optional directory for cached extractions
+    
+    Returns:
+        List of document entries, in the same order as files
+    """
+    # The blocking extract/summary calls run in worker threads, so size
+    # the pool to cover both stages running at full concurrency.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=2 * concurrency))
+    
+    extract_semaphore = asyncio.Semaphore(concurrency)
+    summary_semaphore = asyncio.Semaphore(concurrency)
+    batches = [files[i:i + batch_size]
+               for i in range(0, len(files), batch_size)]
+    outcomes = await asyncio.gather(
+        *(process_batch(drive_client, batch, api_key,
+                        extract_semaphore, summary_semaphore, cache_dir)
+          for batch in batches),
+        return_exceptions=True
+    )
+    
+    results = []
+    for batch, outcome in zip(batches, outcomes):
+        if isinstance(outcome, Exception):
+            names = ", ".join(file_info['name'] for file_info in batch)
+            logger.error(f"Error processing {names}: {str(outcome)}")
+        else:
+            results.extend(outcome)
+    return results
+
+
+async def process_batch(drive_client, batch, api_key,
+                        extract_semaphore, summary_semaphore, cache_dir=None):
+    """
+    Extract a batch of files and summarize them together.
+    
+    Args:
+        drive_client: Google Drive API service object
+        batch: List of file metadata dictionaries
+        api_key: OpenAI API key
+        extract_semaphore: Semaphore bounding concurrent extractions
+        summary_semaphore: Semaphore bounding concurrent summary calls
+        cache_dir: Optional directory for cached extractions
+    
+    Returns:
+        List of document entries for the files with extracted content
+    """
+    contents = await asyncio.gather(
+        *(extract_file(drive_client, file_info, extract_semaphore, cache_dir)
+          for file_info in batch),
+        return_exceptions=True
+    )
+    
+    extracted = []
+    for file_info, content in zip(batch, contents):
+        if isinstance(content, Exception):
+            logger.error(f"Error processing {file_info['name']}: {str(content)}")
+        elif not content or not content.strip():
+            logger.warning(f"No content extracted from: {file_info['name']}")
+        else:
+            extracted.append((file_info, content))
+    
+    if not extracted:
+        return []
+    
+    # Generate summaries with OpenAI; the extraction slots are already
+    # released so other downloads can overlap with this call.
+    async with summary_semaphore:
+        summaries = await asyncio.to_thread(
+            generate_summaries,
+            [content for _, content in extracted],
+            api_key,
+            len(batch)
+        )
+    
+    results = []
+    for (file_info, content), summary in zip(extracted, summaries):
+        logger.info(f"Processed: {file_info['name']}")
+        results.append({
+            'metadata': file_info,
+            'summary': summary,
+            'content': content
+        })
+    return results
+
+
+async def extract_file(drive_client, file_info, extract_semaphore,
+                       cache_dir=None):
+    """Extract content from a file in a worker thread."""
+    async with extract_semaphore:
+        return await asyncio.to_thread(
+            extract_content, drive_client, file_info, cache_dir)
+
+
 def load_config(config_path):
     """Load configuration from file or environment variables."""
     config = {
@@ -128,8 +289,8 @@ def load_config(config_path):
     
     # Try to load from file if it exists
     if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            file_config = json.load(f)
+        with open(config_path, 'rb') as f:
+            file_config = orjson.loads(f.read())
             config.update(file_config)
     
     # Validate required config
@@ -141,43 +302,36 @@ def load_config(config_path):
 
 def initialize_drive_client(credentials_path, token_path):
     """Initialize and return Google Drive API client."""
-    # This function will be implemented in google_drive.py
-    from google_drive import create_drive_client
     return create_drive_client(credentials_path, token_path)
 
 
+def configure_downloads(chunk_mb):
+    """Set the chunk size used for Google Drive downloads."""
+    set_download_chunk_size(chunk_mb * 1024 * 1024)
+
+
 def list_files(drive_client, folder_id=None):
     """List all files in Google Drive (or in specific folder if folder_id provided)."""
-    # This function will be implemented in google_drive.py
-    from google_drive import list_all_files
     return list_all_files(drive_client, folder_id)
 
 
 def get_single_file(drive_client, file_id):
     """Get metadata for a single file by ID."""
-    # This function will be implemented in google_drive.py
-    from google_drive import get_single_file
-    return get_single_file(drive_client, file_id)
+    return get_drive_file(drive_client, file_id)
 
 
-def extract_content(drive_client, file_info):
+def extract_content(drive_client, file_info, cache_dir=None):
     """Extract content from a file based on its MIME type."""
-    # This function will dispatch to appropriate extractors
-    from extractors import extract_file_content
-    return extract_file_content(drive_client, file_info)
+    return extract_file_content(drive_client, file_info, cache_dir)
 
 
-def generate_summary(content, api_key):
-    """Generate summary and extract key concepts using OpenAI."""
-    # This function will be implemented in ai_summary.py
-    from ai_summary import generate_content_summary
-    return generate_content_summary(content, api_key)
+def generate_summaries(contents, api_key, batch_size):
+    """Generate summaries and extract key concepts using OpenAI."""
+    return generate_content_summaries_batch(contents, api_key, batch_size)
 
 
 def generate_markdown(results, output_path):
     """Generate final markdown file from all processed documents."""
-    # This function will be implemented in markdown_generator.py
-    from markdown_generator import create_knowledge_base
     create_knowledge_base(results, output_path)
 
 
@@ -6,12 +6,45 @@ Markdown file optimized for AI consumption.
 """
 
 import logging
+import os
 from datetime import datetime
 import re
+from functools import lru_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Bytes passed to each os.write call when writing the output file
+WRITE_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Characters that are not allowed in anchor links
+_ANCHOR_RE = re.compile(r'[^\w-]')
+
+# Translate table deleting the ASCII characters matched by _ANCHOR_RE
+_ANCHOR_ASCII_DELETE = {
+    code: None for code in range(128)
+    if not (chr(code).isalnum() or chr(code) in '_-')
+}
+
+# Runs of backticks, used to pick a code fence the content cannot close
+_BACKTICK_RUN_RE = re.compile(r'`+')
+
+# Knowledge base header, up to the table of contents entries
+_HEADER_TMPL = ("# Google Drive Knowledge Base\n\n"
+                "*Generated on: {ts}*\n\n"
+                "*This file contains text extracted from documents in Google Drive, "
+                "along with AI-generated summaries.*\n\n"
+                "## Table of Contents\n\n")
+
+# Metadata block of a document section, filled from the file metadata
+_META_TMPL = ("### Metadata\n\n```yaml\ntitle: {name}\ntype: {mime_type}\n"
+              "created: {created_time}\nmodified: {modified_time}\n"
+              "path: {path}\nid: {file_id}\n")
+
+# Markdown syntax that could interfere with the output: code fences,
+# headings, emphasis and links (kept to one line to bound the scan)
+_MD_SYNTAX_RE = re.compile(r'```|[#*]|\[[^\]\n]*\]\(')
+
 
 def create_knowledge_base(document_results, output_path):
     """
@@ -22,34 +55,111 @@ def create_knowledge_base(document_results, output_path):
         output_path: Path to save the output Markdown file
     """
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            # Write header
-            f.write("# Google Drive Knowledge Base\n\n")
-            f.write(f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n")
-            f.write("*This file contains text extracted from documents in Google Drive, along with AI-generated summaries.*\n\n")
-            
-            # Write table of contents
-            f.write("## Table of Contents\n\n")
-            for i, doc in enumerate(document_results, 1):
-                name = doc['metadata'].get('name', 'Unnamed Document')
-                # Create safe anchor link (remove special chars)
-                anchor = create_anchor_link(name)
-                f.write(f"{i}. [{name}](#{anchor})\n")
-            
-            f.write("\n---\n\n")
-            
-            # Write each document
-            for doc in document_results:
-                write_document_section(f, doc)
-                f.write("\n\n---\n\n")  # Separator between documents
-                
-            logger.info(f"Knowledge base written to {output_path}")
+        # Render everything in memory so the file is written in one go
+        data = _render_knowledge_base(document_results).encode('utf-8')
+        _write_file(output_path, data)
+        
+        logger.info(f"Knowledge base written to {output_path}")
             
     except Exception as e:
         logger.error(f"Error creating knowledge base file: {e}")
         raise
 
 
+def _write_file(output_path, data):
+    """
+    Write bytes to a file in large chunks through the raw file descriptor.
+    
+    The data goes to a temporary file next to the target, which then
+    replaces the target atomically, so a crash never leaves a partially
+    written knowledge base behind.
+    
+    Args:
+        output_path: Path of the file to write
+        data: Bytes to write
+    """
+    temp_path = f"{output_path}.tmp"
+    try:
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(data)
+            written = 0
+            while written < len(view):
+                chunk = view[written:written + WRITE_CHUNK_SIZE]
+                written += os.write(fd, chunk)
+        finally:
+            os.close(fd)
+        
+        os.replace(temp_path, output_path)
+    except OSError:
+        # Clean up temporary file
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _render_knowledge_base(document_results):
+    """
+    Render the complete knowledge base as a Markdown string.
+    
+    Args:
+        document_results: List of document entries (each with metadata, summary, content)
+    
+    Returns:
+        The Markdown text of the knowledge base
+    """
+    # Compute every name and anchor once; they feed both the table of
+    # contents and the sections
+    names = [doc['metadata'].get('name', 'Unnamed Document')
+             for doc in document_results]
+    # Create safe anchor links (remove special chars)
+    anchors = _unique_anchors(map(create_anchor_link, names))
+    
+    sections = map(_render_section, document_results, anchors)
+    
+    # Collect header, table of contents and documents, then join them:
+    # str.join sizes the result exactly and copies each part once, where
+    # a growing StringIO reallocates as it goes
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    parts = [_HEADER_TMPL.format(ts=timestamp)]
+    parts.extend(
+        f"{i}. [{name}](#{anchor})\n"
+        for i, (name, anchor) in enumerate(zip(names, anchors), 1)
+    )
+    parts.append("\n---\n\n")
+    for section in sections:
+        parts.append(section)
+        parts.append("\n\n---\n\n")  # Separator between documents
+    
+    return "".join(parts)
+
+
+def _unique_anchors(anchors):
+    """
+    Make anchors unique by suffixing repeats with -2, -3, and so on.
+    
+    Args:
+        anchors: Iterable of anchors, possibly with duplicates
+    
+    Returns:
+        List of distinct anchors in the same order
+    """
+    seen = set()
+    unique = []
+    for anchor in anchors:
+        candidate = anchor
+        suffix = 1
+        while candidate in seen:
+            suffix += 1
+            candidate = f"{anchor}-{suffix}"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+@lru_cache(maxsize=4096)
 def create_anchor_link(text):
     """
     Create a GitHub-compatible anchor link from text.
@@ -60,14 +170,14 @@ def create_anchor_link(text):
     Returns:
         String suitable for use as a Markdown anchor
     """
-    # Convert to lowercase
-    anchor = text.lower()
+    # Convert to lowercase and replace spaces with hyphens
+    anchor = text.lower().replace(' ', '-')
     
-    # Replace spaces with hyphens
-    anchor = anchor.replace(' ', '-')
-    
-    # Remove non-alphanumeric characters (except hyphens)
-    anchor = re.sub(r'[^\w-]', '', anchor)
+    # Remove non-alphanumeric characters (except hyphens). The translate
+    # table handles ASCII; the regex is only needed for other characters.
+    anchor = anchor.translate(_ANCHOR_ASCII_DELETE)
+    if not anchor.isascii():
+        anchor = _ANCHOR_RE.sub('', anchor)
     
     # Ensure it starts with a letter or number
     if anchor and not anchor[0].isalnum():
@@ -76,85 +186,109 @@ def create_anchor_link(text):
     return anchor
 
 
-def write_document_section(file, doc):
+def write_document_section(file, doc, anchor=None):
     """
     Write a document section to the Markdown file.
     
     Args:
         file: File object to write to
         doc: Document entry (metadata, summary, content)
+        anchor: Optional anchor to emit before the section heading, so
+            table of contents links resolve regardless of how the
+            Markdown renderer derives heading IDs
+    """
+    file.write(_render_section(doc, anchor))
+
+
+def _render_section(doc, anchor=None):
     """
+    Render a document section as a Markdown string.
+    
+    Args:
+        doc: Document entry (metadata, summary, content)
+        anchor: Optional anchor to emit before the section heading
+    
+    Returns:
+        The Markdown text of the section
+    """
+    parts = []
+    append = parts.append
+    
     metadata = doc['metadata']
     summary = doc.get('summary', {})
     content = doc.get('content', '')
     
+    # Read every metadata field once
+    md_get = metadata.get
+    name = md_get('name', 'Unnamed Document')
+    mime_type = md_get('mimeType', 'Unknown')
+    created_time = md_get('createdTime', 'Unknown')
+    modified_time = md_get('modifiedTime', 'Unknown')
+    path = md_get('path', 'Unknown path')
+    file_id = md_get('id', 'Unknown ID')
+    url = md_get('webViewLink', '')
+    
     # Document title
-    name = metadata.get('name', 'Unnamed Document')
-    file.write(f"## {name}\n\n")
+    if anchor:
+        append(f'<a id="{anchor}"></a>\n\n')
+    append(f"## {name}\n\n")
     
     # Metadata section
-    file.write("### Metadata\n\n")
-    file.write("```yaml\n")
-    
-    # Format basic metadata
-    file.write(f"title: {name}\n")
-    
-    # File type/MIME type
-    mime_type = metadata.get('mimeType', 'Unknown')
-    file.write(f"type: {mime_type}\n")
-    
-    # Dates
-    created_time = metadata.get('createdTime', 'Unknown')
-    modified_time = metadata.get('modifiedTime', 'Unknown')
-    file.write(f"created: {created_time}\n")
-    file.write(f"modified: {modified_time}\n")
-    
-    # Path
-    path = metadata.get('path', 'Unknown path')
-    file.write(f"path: {path}\n")
-    
-    # File ID
-    file_id = metadata.get('id', 'Unknown ID')
-    file.write(f"id: {file_id}\n")
+    append(_META_TMPL.format(
+        name=name,
+        mime_type=mime_type,
+        created_time=created_time,
+        modified_time=modified_time,
+        path=path,
+        file_id=file_id
+    ))
     
     # URL
-    url = metadata.get('webViewLink', '')
     if url:
-        file.write(f"url: {url}\n")
+        append(f"url: {url}\n")
     
-    file.write("```\n\n")
+    append("```\n\n")
     
     # Summary and key concepts
-    file.write("### Summary & Key Concepts\n\n")
+    append("### Summary & Key Concepts\n\n")
     
     # Write summary
-    if isinstance(summary, dict):
+    # Summaries are almost always dicts; fall back for plain strings
+    try:
         summary_text = summary.get('summary', '')
-        key_concepts = summary.get('key_concepts', [])
-    else:
+        key_concepts = summary.get('key_concepts', ())
+    except AttributeError:
         summary_text = str(summary)
-        key_concepts = []
+        key_concepts = ()
         
     if summary_text:
-        file.write(f"{summary_text}\n\n")
+        append(f"{summary_text}\n\n")
     else:
-        file.write("*No summary available*\n\n")
+        append("*No summary available*\n\n")
     
     # Write key concepts as a bullet list
     if key_concepts:
-        file.write("**Key Concepts:**\n\n")
-        for concept in key_concepts:
-            file.write(f"- {concept}\n")
-        file.write("\n")
+        append("**Key Concepts:**\n\n- ")
+        append("\n- ".join(map(str, key_concepts)))
+        append("\n\n")
     
     # Content section
-    file.write("### Full Content\n\n")
+    append("### Full Content\n\n")
     if content and content.strip():
-        # Clean up content for Markdown
-        content = format_content_for_markdown(content)
-        file.write(f"{content}\n")
+        # Fence content that contains Markdown syntax. The fences are
+        # written around the content rather than formatted into a new
+        # string, which would copy multi-megabyte documents twice.
+        fence = content_fence(content)
+        if fence:
+            append(f"{fence}\n")
+        append(content)
+        append("\n")
+        if fence:
+            append(f"{fence}\n")
     else:
-        file.write("*No content available*\n")
+        append("*No content available*\n")
+    
+    return ''.join(parts)
 
 
 def format_content_for_markdown(content):
@@ -167,19 +301,41 @@ def format_content_for_markdown(content):
     Returns:
         Formatted content string
     """
+    fence = content_fence(content)
+    if fence:
+        return f"{fence}\n{content}\n{fence}"
+    
+    # Otherwise return as regular text
+    return content
+
+
+def content_fence(content):
+    """
+    Choose the code fence needed to embed content in Markdown.
+    
+    Args:
+        content: The text content to embed
+        
+    Returns:
+        The fence to wrap the content in, or an empty string if the
+        content can be embedded as regular text
+    """
     # Add code block fencing for content that might contain Markdown syntax
     # This prevents the document's own formatting from interfering with the output
     
+    # Plain text has none of the characters the syntax regex looks for;
+    # these substring checks are much cheaper than running the regex
+    if ('`' not in content and '#' not in content
+            and '*' not in content and '[' not in content):
+        return ''
+    
     # If content appears to be code or has markdown syntax, wrap in code block
-    if ('```' in content or '#' in content or 
-        '**' in content or '*' in content or
-        '[' in content and '](' in content):
-        
-        # But first, escape any existing backtick blocks
-        if '```' in content:
-            content = content.replace('```', '\\`\\`\\`')
-            
-        return f"```\n{content}\n```"
+    if not _MD_SYNTAX_RE.search(content):
+        return ''
     
-    # Otherwise return as regular text
-    return content
\ No newline at end of file
+    # Use a fence longer than any backtick run in the content, so the
+    # content can be embedded unchanged (CommonMark fence rules)
+    if '`' not in content:
+        return '```'
+    longest = max(map(len, _BACKTICK_RUN_RE.findall(content)))
+    return '`' * max(3, longest + 1)
@@ -0,0 +1,216 @@
+"""
+Embedding-similarity cache for AI-generated summaries.
+
+This module reuses the summary of a previously processed document when a
+new document's embedding is nearly identical, which catches re-uploaded
+files and lightly edited drafts that the exact-hash cache misses.
+"""
+
+import os
+import logging
+import json
+import sqlite3
+import threading
+import time
+
+from summary_cache import DEFAULT_TTL
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model used to embed document content
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Minimum cosine similarity for two documents to share a summary
+SIMILARITY_THRESHOLD = 0.92
+
+_cache_path = None
+_connection = None
+_vectors = None
+_responses = []
+# Row of each loaded entry in _vectors, by input hash
+_rows = {}
+# Summary model and prompt version the loaded entries belong to
+_loaded_for = None
+# Lookups happen from worker threads, so serialize access to the index.
+_lock = threading.Lock()
+
+
+def configure(cache_dir):
+    """
+    Set the directory holding the semantic cache.
+
+    The cache is disabled until this is called with a directory.
+
+    Args:
+        cache_dir: Directory for the cache database, or None to disable
+            the semantic cache
+    """
+    global _cache_path, _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+        _reset_index()
+
+        if cache_dir and not NUMPY_AVAILABLE:
+            logger.warning("numpy not installed. Semantic cache disabled.")
+            cache_dir = None
+
+        if cache_dir:
+            _cache_path = os.path.join(cache_dir, 'semantic.db')
+        else:
+            _cache_path = None
+
+
+def is_enabled():
+    """Return True if the semantic cache is configured."""
+    return _cache_path is not None
+
+
+def _reset_index():
+    """Forget all loaded entries. Caller must hold _lock."""
+    global _vectors, _responses, _rows, _loaded_for
+    _vectors = None
+    _responses = []
+    _rows = {}
+    _loaded_for = None
+
+
+def _load(model, prompt_version):
+    """
+    Open the database and load the stored vectors of unexpired entries
+    for a summary model and prompt version. Caller must hold _lock.
+    """
+    global _connection, _vectors, _responses, _rows, _loaded_for
+    if _connection is None:
+        os.makedirs(os.path.dirname(_cache_path) or '.', exist_ok=True)
+        _connection = sqlite3.connect(_cache_path, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS summary_embeddings ("
+            "input_hash TEXT PRIMARY KEY, "
+            "embedding_model TEXT, "
+            "model TEXT, "
+            "prompt_version TEXT, "
+            "embedding BLOB, "
+            "response TEXT, "
+            "created_at INT, "
+            "expires_at INT)"
+        )
+
+    if _loaded_for == (model, prompt_version):
+        return
+
+    _reset_index()
+    rows = _connection.execute(
+        "SELECT input_hash, embedding, response FROM summary_embeddings "
+        "WHERE embedding_model = ? AND model = ? AND prompt_version = ? "
+        "AND expires_at > ?",
+        (EMBEDDING_MODEL, model, prompt_version, int(time.time()))
+    ).fetchall()
+
+    if rows:
+        _vectors = np.vstack(
+            [np.frombuffer(row[1], dtype=np.float32) for row in rows])
+    _responses = [row[2] for row in rows]
+    _rows = {row[0]: i for i, row in enumerate(rows)}
+    _loaded_for = (model, prompt_version)
+
+
+def _normalize(embedding):
+    """Return the embedding as an L2-normalized float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def lookup(embedding, model, prompt_version):
+    """
+    Find the summary of the most similar previously seen document.
+
+    Args:
+        embedding: Embedding of the document content
+        model: Name of the model the summary must come from
+        prompt_version: Version of the prompt the summary must come from
+
+    Returns:
+        Summary dictionary if a stored document is similar enough,
+        otherwise None
+    """
+    if not is_enabled():
+        return None
+
+    vector = _normalize(embedding)
+    with _lock:
+        try:
+            _load(model, prompt_version)
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading semantic cache: {e}")
+            return None
+
+        if _vectors is None:
+            return None
+
+        # Vectors are normalized, so the inner product is the cosine
+        scores = _vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < SIMILARITY_THRESHOLD:
+            return None
+        response = _responses[best]
+
+    logger.debug(f"Semantic cache hit with similarity {scores[best]:.3f}")
+    return json.loads(response)
+
+
+def add(key, embedding, value, model, prompt_version, ttl=DEFAULT_TTL):
+    """
+    Store a document embedding along with its summary.
+
+    Args:
+        key: Hash identifying the summary request
+        embedding: Embedding of the document content
+        value: Summary dictionary for the document
+        model: Name of the model that produced the summary
+        prompt_version: Version of the prompt used for the summary
+        ttl: Number of seconds before the entry expires
+    """
+    if not is_enabled():
+        return
+
+    global _vectors
+    vector = _normalize(embedding)
+    response = json.dumps(value)
+    now = int(time.time())
+    with _lock:
+        try:
+            _load(model, prompt_version)
+            with _connection:
+                _connection.execute(
+                    "INSERT OR REPLACE INTO summary_embeddings "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, EMBEDDING_MODEL, model, prompt_version,
+                     vector.tobytes(), response, now, now + ttl)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing semantic cache: {e}")
+            return
+
+        # A replaced row is updated in place rather than loaded twice
+        row = _rows.get(key)
+        if row is not None:
+            _vectors[row] = vector
+            _responses[row] = response
+        elif _vectors is None:
+            _vectors = vector[np.newaxis, :]
+            _rows[key] = 0
+            _responses.append(response)
+        else:
+            _vectors = np.vstack([_vectors, vector])
+            _rows[key] = len(_responses)
+            _responses.append(response)
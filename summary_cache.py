@@ -0,0 +1,121 @@
+"""
+On-disk cache for AI-generated summaries.
+
+This module stores summary results in a SQLite database keyed by a hash of
+the model, prompt version and document content, so unchanged documents are
+not summarized again on later runs.
+"""
+
+import os
+import logging
+import json
+import sqlite3
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default directory for mtexts caches
+DEFAULT_CACHE_DIR = '.mtexts_cache'
+
+# Cached summaries expire after one week
+DEFAULT_TTL = 7 * 86400
+
+_cache_path = os.path.join(DEFAULT_CACHE_DIR, 'summaries.db')
+_connection = None
+# Summaries are generated from worker threads, so serialize access to the
+# shared connection.
+_lock = threading.Lock()
+
+
+def configure(cache_dir):
+    """
+    Set the directory holding the summary cache.
+
+    Args:
+        cache_dir: Directory for the cache database, or None to disable
+            caching
+    """
+    global _cache_path, _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+        if cache_dir:
+            _cache_path = os.path.join(cache_dir, 'summaries.db')
+        else:
+            _cache_path = None
+
+
+def _get_connection():
+    """Open the cache database on first use. Caller must hold _lock."""
+    global _connection
+    if _connection is None and _cache_path:
+        os.makedirs(os.path.dirname(_cache_path) or '.', exist_ok=True)
+        _connection = sqlite3.connect(_cache_path, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "input_hash TEXT PRIMARY KEY, "
+            "prompt_version TEXT, "
+            "model TEXT, "
+            "response TEXT, "
+            "created_at INT, "
+            "expires_at INT)"
+        )
+    return _connection
+
+
+def get(key):
+    """
+    Look up a cached summary.
+
+    Args:
+        key: Hash identifying the summary request
+
+    Returns:
+        Cached summary dictionary, or None if missing or expired
+    """
+    with _lock:
+        try:
+            connection = _get_connection()
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT response FROM summaries "
+                "WHERE input_hash = ? AND expires_at > ?",
+                (key, int(time.time()))
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading summary cache: {e}")
+            return None
+
+    return json.loads(row[0]) if row else None
+
+
+def put(key, value, model, prompt_version, ttl=DEFAULT_TTL):
+    """
+    Store a summary in the cache.
+
+    Args:
+        key: Hash identifying the summary request
+        value: Summary dictionary to store
+        model: Name of the model that produced the summary
+        prompt_version: Version of the prompt used for the summary
+        ttl: Number of seconds before the entry expires
+    """
+    now = int(time.time())
+    with _lock:
+        try:
+            connection = _get_connection()
+            if connection is None:
+                return
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO summaries "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, prompt_version, model, json.dumps(value),
+                     now, now + ttl)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing summary cache: {e}")